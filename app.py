@@ -1,10 +1,19 @@
+import os
+import re
 import uuid
+import json
+import hashlib
 import streamlit as st
-import requests
 import time
-from datetime import datetime
-from typing import List, Dict
-from supabase import create_client, Client
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, List, Dict, Optional
+
+# supabase and requests are imported lazily inside the cached client
+# factories below — importing supabase alone costs ~250ms on a cold start
+if TYPE_CHECKING:
+    import requests
+    from supabase import Client
 
 # ============================================================
 # PAGE CONFIGURATION
@@ -25,25 +34,104 @@ MAKE_WEBHOOK_URL  = st.secrets["MAKE_WEBHOOK_URL"]
 SUPABASE_URL      = st.secrets["SUPABASE_URL"]
 SUPABASE_ANON_KEY = st.secrets["SUPABASE_ANON_KEY"]
 
+# ============================================================
+# APP CONSTANTS
+# ============================================================
+
+RFP_EXTENSIONS       = frozenset({".pdf"})
+REFERENCE_EXTENSIONS = frozenset({".pdf", ".docx", ".doc", ".txt"})
+
+# Identical re-submits inside this window are treated as double-clicks
+DUPLICATE_WINDOW_SECONDS = 60
+
+# Singapore has no DST, so a fixed offset is exact on any host timezone
+SGT = timezone(timedelta(hours=8), "SGT")
+
 # ============================================================
 # SUPABASE CLIENT
 # ============================================================
 
 @st.cache_resource
-def init_supabase() -> Client:
-    """Initialize Supabase client — cached for performance"""
-    return create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+def init_supabase() -> "Client":
+    """
+    Initialize Supabase client — cached for performance.
+    One client per server process, so every session reuses the same
+    pooled HTTP/2 connections to PostgREST and Storage.
+    """
+    from supabase import create_client
+    from supabase.lib.client_options import ClientOptions
+
+    return create_client(
+        SUPABASE_URL,
+        SUPABASE_ANON_KEY,
+        options=ClientOptions(
+            postgrest_client_timeout=10,
+            storage_client_timeout=30,   # RFP uploads can be up to 10MB
+        )
+    )
+
+# ============================================================
+# HTTP SESSION (MAKE.COM)
+# ============================================================
+
+WEBHOOK_WORKERS = 4   # concurrent Make.com dispatches per server process
+
+@st.cache_resource
+def init_http_session() -> "requests.Session":
+    """
+    Pooled HTTP session for Make.com — cached so submissions reuse the
+    same keep-alive TLS connection instead of a fresh handshake each time.
+    Failed connects and 502/503 responses (never processed) are retried
+    with backoff; read timeouts and 504s are not, since Make.com may
+    already be running the scenario for that POST.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=2,
+        connect=2,
+        read=False,     # re-raise read timeouts as-is instead of re-POSTing
+        status=2,
+        backoff_factor=0.3,
+        status_forcelist=[502, 503],
+        allowed_methods=frozenset({"POST"}),
+        raise_on_status=False
+    )
+    session = requests.Session()
+    # One host (Make.com), and at most WEBHOOK_WORKERS threads posting to it
+    session.mount(
+        "https://",
+        HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=WEBHOOK_WORKERS,
+            max_retries=retry
+        )
+    )
+    return session
 
-supabase: Client = init_supabase()
+
+@st.cache_resource
+def init_webhook_pool() -> ThreadPoolExecutor:
+    """
+    Process-wide worker pool for Make.com dispatches — shared by every
+    session, so concurrent submissions queue onto a few workers (and the
+    pooled session above) instead of each spawning its own thread.
+    """
+    return ThreadPoolExecutor(
+        max_workers=WEBHOOK_WORKERS,
+        thread_name_prefix="make-webhook"
+    )
 
 # ============================================================
 # CUSTOM CSS — CYBERSECURITY AESTHETIC
 # ============================================================
 
-st.markdown("""
+# <style> must come first: markdown ends a leading <link> block at the
+# first blank line, which would turn the indented CSS into a code block
+CUSTOM_CSS = """
 <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600;700&display=swap');
-
     * { font-family: 'Inter', sans-serif; }
 
     .stApp {
@@ -121,34 +209,87 @@ st.markdown("""
     .badge-error      { background-color: #4d1e1e; color: #ff6b6b; border: 1px solid #ff6b6b; }
     .badge-info       { background-color: #1e3a52; color: #00d4ff; border: 1px solid #00d4ff; }
 </style>
-""", unsafe_allow_html=True)
+<link rel="preconnect" href="https://fonts.googleapis.com">
+<link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+<link rel="stylesheet" href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600;700&display=swap">
+"""
+
+# Static HTML blocks — module constants, like the CSS above
+SIDEBAR_LOGO_HTML = """
+<div style='text-align:center; padding: 24px 0 16px 0;'>
+    <div style='font-size:52px;'>🛡️</div>
+    <h3 style='color:#00d4ff; margin:10px 0 4px 0;'>DACTA SG</h3>
+    <p style='color:#a8c5e0; font-size:12px; margin:0;'>Proposal Architect</p>
+</div>
+"""
+
+HEADER_HTML = """
+<div style='text-align:center; padding:24px 0 8px 0;'>
+    <h1>🛡️ DACTA SG Proposal Architect</h1>
+    <p style='color:#a8c5e0; font-size:15px; margin-top:4px;'>
+        AI-Powered Proposal Generation — Gemini · DeepSeek · Perplexity · Claude
+    </p>
+</div>
+"""
+
+FOOTER_HTML = """
+<div style='text-align:center; padding:16px; color:#6b8ca8;'>
+    <p style='font-size:12px; margin:0;'>
+        © 2025 DACTA SG · Proposal Architect v1.0.0<br>
+        Gemini · DeepSeek · Perplexity · Claude
+    </p>
+</div>
+"""
+
+@st.cache_resource
+def minified_css() -> str:
+    """
+    CUSTOM_CSS with whitespace runs collapsed to single spaces — computed
+    once per server process and shared (uncopied) by every rerun and
+    session. Only whitespace runs are touched, so selectors and values
+    keep their meaning.
+    """
+    return re.sub(r"\s+", " ", CUSTOM_CSS).strip()
+
+st.markdown(minified_css(), unsafe_allow_html=True)
 
 # ============================================================
 # HELPER FUNCTIONS
 # ============================================================
 
-def upload_rfp_to_supabase(
-    rfp_file,
-    submission_id: str
+def upload_file_to_supabase(
+    file_bytes: bytes,
+    file_path: str,
+    content_type: str
 ) -> tuple[bool, str]:
     """
-    Upload RFP PDF to Supabase Storage bucket 'rfp-documents'.
+    Upload raw file bytes to Supabase Storage bucket 'rfp-documents'.
+    Takes bytes (not the UploadedFile) so callers read each buffer once.
     Returns (success, signed_url_or_error_message)
     """
     try:
-        file_path = f"{submission_id}/{rfp_file.name}"
-        file_bytes = rfp_file.getvalue()
-
         # Upload file to Supabase Storage
         supabase.storage \
             .from_("rfp-documents") \
             .upload(
                 path=file_path,
                 file=file_bytes,
-                file_options={"content-type": "application/pdf"}
+                file_options={"content-type": content_type}
             )
 
-        # Generate signed URL valid for 1 hour (enough for Make.com to process)
+    except Exception as e:
+        return False, f"Storage upload error: {str(e)}"
+
+    return sign_file_in_supabase(file_path)
+
+
+def sign_file_in_supabase(file_path: str) -> tuple[bool, str]:
+    """
+    Create a signed URL for a file in bucket 'rfp-documents'.
+    Returns (success, signed_url_or_error_message)
+    """
+    try:
+        # Signed URL valid for 1 hour (enough for Make.com to process)
         signed = supabase.storage \
             .from_("rfp-documents") \
             .create_signed_url(file_path, expires_in=3600)
@@ -156,7 +297,137 @@ def upload_rfp_to_supabase(
         return True, signed["signedURL"]
 
     except Exception as e:
-        return False, f"Storage upload error: {str(e)}"
+        return False, f"Storage signing error: {str(e)}"
+
+
+def upload_rfp_to_supabase(
+    rfp_bytes: bytes,
+    filename: str,
+    submission_id: str
+) -> tuple[bool, str]:
+    """
+    Upload RFP PDF to Supabase Storage bucket 'rfp-documents'.
+    Returns (success, signed_url_or_error_message)
+    """
+    return upload_file_to_supabase(
+        rfp_bytes,
+        f"{submission_id}/{filename}",
+        "application/pdf"
+    )
+
+
+def find_stored_references(content_hashes: List[str]) -> Dict[str, str]:
+    """
+    Look up reference documents already in Storage by content hash,
+    in one query for the whole batch.
+    Returns {content_hash: storage_path} — empty on any error.
+    """
+    try:
+        response = (
+            supabase.table("reference_docs")
+            .select("content_hash, storage_path")
+            .in_("content_hash", sorted(set(content_hashes)))
+            .not_.is_("storage_path", "null")
+            .execute()
+        )
+        return {row["content_hash"]: row["storage_path"] for row in response.data}
+    except Exception:
+        return {}
+
+
+def upload_reference_docs_to_supabase(
+    reference_files: list,
+    submission_id: str
+) -> tuple[List[Dict], List[str]]:
+    """
+    Upload reference documents next to the RFP so Make.com can fetch them
+    by signed URL. Files whose BLAKE2b content hash is already recorded in
+    `reference_docs` are re-signed at their existing path, not re-uploaded.
+    Hashing and uploads both run in parallel: hashlib releases the GIL
+    on large buffers, and the Supabase client is thread-safe.
+    Non-critical — a failed file is sent with url=None.
+    Returns (reference_documents_payload, error_messages)
+    """
+    if not reference_files:
+        return [], []
+
+    file_bytes = [f.getvalue() for f in reference_files]
+
+    def content_hash_of(data: bytes) -> str:
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def upload(i: int, stored_path: Optional[str]) -> tuple[bool, str, Optional[str]]:
+        f = reference_files[i]
+
+        if stored_path:
+            ok, result = sign_file_in_supabase(stored_path)
+            if ok:
+                return True, result, stored_path
+            # Stored copy is gone — fall through and upload it again
+
+        # Index prefix keeps same-named references from colliding in storage
+        file_path = f"{submission_id}/references/{i}/{f.name}"
+        ok, result = upload_file_to_supabase(
+            file_bytes[i],
+            file_path,
+            f.type or "application/octet-stream"
+        )
+        return ok, result, file_path if ok else None
+
+    with ThreadPoolExecutor(max_workers=min(8, len(reference_files))) as pool:
+        hashes  = list(pool.map(content_hash_of, file_bytes))
+        stored  = find_stored_references(hashes)
+        results = list(pool.map(
+            upload,
+            range(len(reference_files)),
+            [stored.get(content_hash) for content_hash in hashes]
+        ))
+
+    docs, errors = [], []
+    for f, content_hash, (ok, result, file_path) in zip(reference_files, hashes, results):
+        docs.append({
+            "filename":     f.name,
+            "size":         f.size,
+            "url":          result if ok else None,
+            "content_hash": content_hash,
+            "storage_path": file_path,
+        })
+        if not ok:
+            errors.append(f"{f.name}: {result}")
+    return docs, errors
+
+
+def submission_fingerprint(
+    client_name: str,
+    service_types: List[str],
+    rfp_bytes: bytes
+) -> str:
+    """
+    BLAKE2b fingerprint of what makes a submission unique — client,
+    services and RFP content. Used to catch accidental double-submits.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update("|".join([client_name.strip(), *sorted(service_types)]).encode("utf-8"))
+    h.update(rfp_bytes)
+    return h.hexdigest()
+
+
+def is_recent_duplicate(submission_key: str) -> bool:
+    """
+    True if this session dispatched the same submission within
+    DUPLICATE_WINDOW_SECONDS. A dispatch whose webhook already failed
+    doesn't count, so the user can retry straight away.
+    """
+    last_key = st.session_state.last_submission_key
+    if last_key is None or last_key[0] != submission_key:
+        return False
+    if time.monotonic() - last_key[1] >= DUPLICATE_WINDOW_SECONDS:
+        return False
+
+    webhook_future = st.session_state.webhook_future
+    if webhook_future is not None and webhook_future.done():
+        return webhook_future.result()[0]   # success flag of dispatch_to_make
+    return True
 
 
 def validate_inputs(
@@ -175,8 +446,8 @@ def validate_inputs(
     if rfp_file is None:
         return False, "Please upload an RFP document."
 
-    ext = "." + rfp_file.name.rsplit(".", 1)[-1].lower()
-    if ext != ".pdf":
+    ext = os.path.splitext(rfp_file.name)[1].lower()
+    if ext not in RFP_EXTENSIONS:
         return False, "Only PDF files are accepted. Please convert your document to PDF first."
 
     size_mb = rfp_file.size / (1024 * 1024)
@@ -186,9 +457,14 @@ def validate_inputs(
     return True, ""
 
 
-def log_submission_to_supabase(payload: Dict, rfp_url: str) -> tuple[bool, str]:
+def log_submission_with_refs(
+    payload: Dict,
+    rfp_url: str
+) -> tuple[bool, str]:
     """
-    Insert initial proposal record into Supabase.
+    Insert the proposal record and its reference document records in a
+    single round-trip via the `create_proposal` Postgres function
+    (see supabase/migrations). Both inserts share one transaction.
     Returns (success, record_id_or_error_message)
     """
     try:
@@ -204,51 +480,40 @@ def log_submission_to_supabase(payload: Dict, rfp_url: str) -> tuple[bool, str]:
             "include_timeline": str(payload["options"]["include_timeline"]),
             "additional_notes": payload["options"]["additional_notes"],
         }
+        refs = [
+            {
+                "filename":     doc["filename"],
+                "file_size":    doc["size"],
+                "content_hash": doc["content_hash"],
+                "storage_path": doc["storage_path"],
+            }
+            for doc in payload["reference_documents"]
+        ]
 
         response = (
-            supabase.table("proposals")
-            .insert(data)
+            supabase.rpc("create_proposal", {"p": data, "refs": refs})
             .execute()
         )
 
         if response.data:
-            return True, response.data[0]["id"]
+            return True, response.data
         else:
-            return False, "Supabase returned no data on insert."
+            return False, "Supabase returned no data from create_proposal."
 
     except Exception as e:
         return False, f"Supabase insert error: {str(e)}"
 
 
-def log_reference_docs_to_supabase(
-    proposal_id: str,
-    reference_files: list
-) -> None:
-    """
-    Insert reference document records. Non-critical — fails silently.
-    """
-    if not reference_files:
-        return
-    try:
-        rows = [
-            {
-                "proposal_id": proposal_id,
-                "filename":    f.name,
-                "file_size":   f.size,
-            }
-            for f in reference_files
-        ]
-        supabase.table("reference_docs").insert(rows).execute()
-    except Exception as e:
-        st.warning(f"⚠️ Reference docs note: {str(e)}")
-
-
 def update_supabase_status(
     submission_id: str,
     status: str,
     extra_fields: Dict = None
-) -> None:
-    """Update proposal status in Supabase"""
+) -> tuple[bool, str]:
+    """
+    Update proposal status in Supabase.
+    Returns (success, error_message) — called from the webhook worker
+    thread, so it must not render anything itself.
+    """
     try:
         update_data = {"status": status}
         if extra_fields:
@@ -257,8 +522,46 @@ def update_supabase_status(
             .update(update_data) \
             .eq("submission_id", submission_id) \
             .execute()
+        return True, ""
     except Exception as e:
-        st.warning(f"⚠️ Status update note: {str(e)}")
+        return False, f"Status update error: {str(e)}"
+
+
+@st.cache_data(ttl=3, show_spinner=False)
+def fetch_submission_status(submission_id: str) -> Optional[str]:
+    """
+    Read the current proposal status back from Supabase.
+    Cached for 3s so bursts of reruns collapse into one query.
+    """
+    try:
+        response = (
+            supabase.table("proposals")
+            .select("status")
+            .eq("submission_id", submission_id)
+            .limit(1)
+            .execute()
+        )
+        return response.data[0]["status"] if response.data else None
+    except Exception:
+        return None
+
+
+@st.cache_data(ttl=3, show_spinner=False)
+def fetch_submission_events(submission_id: str) -> List[str]:
+    """
+    Read the pipeline steps Make.com has completed for a submission
+    from `proposal_events` (one row per step). Cached like the status.
+    """
+    try:
+        response = (
+            supabase.table("proposal_events")
+            .select("step")
+            .eq("submission_id", submission_id)
+            .execute()
+        )
+        return [row["step"] for row in response.data]
+    except Exception:
+        return []
 
 
 def send_to_make(payload: Dict) -> tuple[bool, str, Dict]:
@@ -266,11 +569,17 @@ def send_to_make(payload: Dict) -> tuple[bool, str, Dict]:
     Send payload to Make.com webhook.
     Returns (success, message, response_data)
     """
+    import requests
+
+    # Compact separators and raw UTF-8 (no \uXXXX escapes for client
+    # names or notes) keep the body smaller than requests' json= default
+    body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
     try:
-        response = requests.post(
+        response = http_session.post(
             MAKE_WEBHOOK_URL,
-            json=payload,
-            headers={"Content-Type": "application/json"},
+            data=body,
+            headers={"Content-Type": "application/json; charset=utf-8"},
             timeout=60
         )
 
@@ -299,28 +608,72 @@ def send_to_make(payload: Dict) -> tuple[bool, str, Dict]:
         return False, f"Unexpected error: {str(e)}", {}
 
 
+def dispatch_to_make(payload: Dict) -> tuple[bool, str, str]:
+    """
+    Background worker — send payload to Make.com and record the outcome.
+    Runs on the shared webhook pool so the UI never waits on the scenario.
+    The outcome lands in Supabase (status column) and in the returned
+    Future, which the Submission Tracker checks on later reruns.
+    Returns (success, message, status_error) — status_error is "" unless
+    the Supabase status write failed.
+    """
+    success, message, response_data = send_to_make(payload)
+
+    if success:
+        status = "draft_ready" if response_data else "processing"
+    else:
+        status = "failed"
+    _, status_error = update_supabase_status(
+        payload["metadata"]["submission_id"],
+        status=status
+    )
+
+    return success, message, status_error
+
+
+def settle_dispatches() -> bool:
+    """
+    Count queued dispatches that have since finished. A submission only
+    counts once Make.com accepts it, so a misconfigured webhook never
+    inflates the session stats. Returns True if any were newly accepted.
+    """
+    pending  = st.session_state.pending_dispatches
+    finished = [f for f in pending if f.done()]
+    accepted = sum(1 for f in finished if f.result()[0])
+
+    st.session_state.pending_dispatches = [f for f in pending if f not in finished]
+    st.session_state.submission_count += accepted
+    return accepted > 0
+
+
 # ============================================================
 # SESSION STATE
 # ============================================================
 
-if "submission_count" not in st.session_state:
-    st.session_state.submission_count = 0
+SESSION_DEFAULTS = {
+    "submission_count":    0,
+    "last_submission_id":  None,
+    "last_submission_key": None,   # (fingerprint, time.monotonic())
+    "webhook_future":      None,
+    "pending_dispatches":  [],     # queued futures not yet counted
+    "tracked_status":      None,
+}
+for key, value in SESSION_DEFAULTS.items():
+    st.session_state.setdefault(key, value)
+
+# Before the sidebar, so its stats include dispatches accepted since last run
+newly_accepted = settle_dispatches()
 
-if "last_submission_id" not in st.session_state:
-    st.session_state.last_submission_id = None
+# Guarded rather than setdefault() so the date is only formatted once
+if "session_date" not in st.session_state:
+    st.session_state.session_date = datetime.now(SGT).strftime('%d %b %Y')
 
 # ============================================================
 # SIDEBAR
 # ============================================================
 
 with st.sidebar:
-    st.markdown("""
-        <div style='text-align:center; padding: 24px 0 16px 0;'>
-            <div style='font-size:52px;'>🛡️</div>
-            <h3 style='color:#00d4ff; margin:10px 0 4px 0;'>DACTA SG</h3>
-            <p style='color:#a8c5e0; font-size:12px; margin:0;'>Proposal Architect</p>
-        </div>
-    """, unsafe_allow_html=True)
+    st.markdown(SIDEBAR_LOGO_HTML, unsafe_allow_html=True)
 
     st.markdown("---")
 
@@ -332,13 +685,14 @@ with st.sidebar:
         "Database": bool(SUPABASE_URL and SUPABASE_ANON_KEY),
     }
 
+    system_badges = []
     for label, ok in checks.items():
         badge = "badge-ready" if ok else "badge-error"
         icon  = "✓" if ok else "✗"
-        st.markdown(
-            f'<span class="status-badge {badge}">{icon} {label}</span>',
-            unsafe_allow_html=True
+        system_badges.append(
+            f'<span class="status-badge {badge}">{icon} {label}</span>'
         )
+    st.markdown("<br>".join(system_badges), unsafe_allow_html=True)
 
     st.markdown("---")
 
@@ -350,12 +704,14 @@ with st.sidebar:
         ("🌐", "Perplexity",        "Market Research"),
         ("✍️", "Claude 3.5 Sonnet", "Proposal Drafting"),
     ]
-    for icon, name, role in pipeline:
-        st.markdown(
+    st.markdown(
+        "\n\n".join(
             f"{icon} **{name}**  \n"
-            f"<span style='color:#6b8ca8; font-size:12px;'>{role}</span>",
-            unsafe_allow_html=True
-        )
+            f"<span style='color:#6b8ca8; font-size:12px;'>{role}</span>"
+            for icon, name, role in pipeline
+        ),
+        unsafe_allow_html=True
+    )
 
     st.markdown("---")
 
@@ -363,7 +719,7 @@ with st.sidebar:
         st.markdown(f"""
         **Submissions this session:** {st.session_state.submission_count}  
         **Last ID:** `{st.session_state.last_submission_id or 'None'}`  
-        **Date:** {datetime.now().strftime('%d %b %Y')}
+        **Date:** {st.session_state.session_date}
         """)
 
     with st.expander("❓ Help"):
@@ -388,129 +744,140 @@ with st.sidebar:
 # MAIN DASHBOARD
 # ============================================================
 
-st.markdown("""
-    <div style='text-align:center; padding:24px 0 8px 0;'>
-        <h1>🛡️ DACTA SG Proposal Architect</h1>
-        <p style='color:#a8c5e0; font-size:15px; margin-top:4px;'>
-            AI-Powered Proposal Generation — Gemini · DeepSeek · Perplexity · Claude
-        </p>
-    </div>
-""", unsafe_allow_html=True)
+st.markdown(HEADER_HTML, unsafe_allow_html=True)
 
 st.markdown("---")
 
-# ── SECTION 1: Proposal Details ──────────────────────────────
-st.markdown("### 📝 Proposal Details")
+# Everything up to the Generate button lives in one form, so editing a
+# field does not rerun the script — only submitting does. The readiness
+# panel and upload summaries therefore reflect the last submitted values.
+with st.form("proposal_form", border=False):
 
-col1, col2 = st.columns([2, 1])
+    # ── SECTION 1: Proposal Details ──────────────────────────
+    st.markdown("### 📝 Proposal Details")
 
-with col1:
-    client_name = st.text_input(
-        "Client Name *",
-        placeholder="e.g., Singapore Power, DBS Bank, MINDEF",
-        help="Full name of the client organization"
-    )
+    col1, col2 = st.columns([2, 1])
 
-    service_types = st.multiselect(
-        "Service Type(s) *",
-        options=[
-            "Security Operations",
-            "Cybersecurity Engineering",
-            "Consulting"
-        ],
-        default=[],
-        help="Select all services to include in this proposal"
-    )
-
-    if service_types:
-        badges = "".join(
-            f'<span class="status-badge badge-info">{s}</span>'
-            for s in service_types
+    with col1:
+        client_name = st.text_input(
+            "Client Name *",
+            placeholder="e.g., Singapore Power, DBS Bank, MINDEF",
+            help="Full name of the client organization"
         )
-        st.markdown(badges, unsafe_allow_html=True)
 
-with col2:
-    st.markdown("### ✅ Readiness")
-    checks = {
-        "Client Name": bool(client_name),
-        "Services":    bool(service_types),
-    }
-    for label, ok in checks.items():
-        color = "#00ff88" if ok else "#ff6b6b"
-        mark  = "✓" if ok else "✗"
-        st.markdown(
-            f"**{label}:** <span style='color:{color};'>{mark}</span>",
-            unsafe_allow_html=True
+        service_types = st.multiselect(
+            "Service Type(s) *",
+            options=[
+                "Security Operations",
+                "Cybersecurity Engineering",
+                "Consulting"
+            ],
+            default=[],
+            help="Select all services to include in this proposal"
         )
 
-st.markdown("---")
+        if service_types:
+            badges = "".join(
+                f'<span class="status-badge badge-info">{s}</span>'
+                for s in service_types
+            )
+            st.markdown(badges, unsafe_allow_html=True)
 
-# ── SECTION 2: Document Upload ───────────────────────────────
-st.markdown("### 📤 Document Upload")
+    with col2:
+        st.markdown("### ✅ Readiness")
+        checks = {
+            "Client Name": bool(client_name),
+            "Services":    bool(service_types),
+        }
+        readiness_rows = []
+        for label, ok in checks.items():
+            color = "#00ff88" if ok else "#ff6b6b"
+            mark  = "✓" if ok else "✗"
+            readiness_rows.append(
+                f"**{label}:** <span style='color:{color};'>{mark}</span>"
+            )
+        st.markdown("  \n".join(readiness_rows), unsafe_allow_html=True)
 
-up_col1, up_col2 = st.columns(2)
+    st.markdown("---")
 
-with up_col1:
-    rfp_file = st.file_uploader(
-        "RFP Document * (PDF only)",
-        type=["pdf"],
-        help="Upload the RFP as a PDF. Max 10MB. Convert DOCX to PDF first.",
-        key="rfp_uploader"
-    )
-    if rfp_file:
-        st.success(f"✓ {rfp_file.name} ({rfp_file.size / 1024:.1f} KB)")
-
-with up_col2:
-    reference_files = st.file_uploader(
-        "Reference Materials (Optional)",
-        type=["pdf", "docx", "doc", "txt"],
-        accept_multiple_files=True,
-        help="Partner specs, past proposals, compliance docs",
-        key="reference_uploader"
-    )
-    if reference_files:
-        st.success(f"✓ {len(reference_files)} reference file(s) attached")
-        with st.expander("View files"):
-            for f in reference_files:
-                st.markdown(f"- `{f.name}` ({f.size / 1024:.1f} KB)")
+    # ── SECTION 2: Document Upload ───────────────────────────
+    st.markdown("### 📤 Document Upload")
 
-st.markdown("---")
+    up_col1, up_col2 = st.columns(2)
 
-# ── SECTION 3: Advanced Options ──────────────────────────────
-with st.expander("⚙️ Proposal Options"):
-    opt_col1, opt_col2 = st.columns(2)
+    with up_col1:
+        rfp_file = st.file_uploader(
+            "RFP Document * (PDF only)",
+            type=sorted(RFP_EXTENSIONS),
+            help="Upload the RFP as a PDF. Max 10MB. Convert DOCX to PDF first.",
+            key="rfp_uploader"
+        )
+        if rfp_file:
+            st.success(f"✓ {rfp_file.name} ({rfp_file.size / 1024:.1f} KB)")
+
+    with up_col2:
+        reference_files = st.file_uploader(
+            "Reference Materials (Optional)",
+            type=sorted(REFERENCE_EXTENSIONS),
+            accept_multiple_files=True,
+            help="Partner specs, past proposals, compliance docs",
+            key="reference_uploader"
+        )
+        if reference_files:
+            st.success(f"✓ {len(reference_files)} reference file(s) attached")
+            with st.expander("View files"):
+                st.markdown("\n".join(
+                    f"- `{f.name}` ({f.size / 1024:.1f} KB)"
+                    for f in reference_files
+                ))
+
+    st.markdown("---")
 
-    with opt_col1:
-        include_pricing  = st.checkbox("Include Pricing Section",  value=True)
-        include_timeline = st.checkbox("Include Project Timeline", value=True)
+    # ── SECTION 3: Advanced Options ──────────────────────────
+    with st.expander("⚙️ Proposal Options"):
+        opt_col1, opt_col2 = st.columns(2)
+
+        with opt_col1:
+            include_pricing  = st.checkbox("Include Pricing Section",  value=True)
+            include_timeline = st.checkbox("Include Project Timeline", value=True)
+
+        with opt_col2:
+            tone_preference = st.selectbox(
+                "Proposal Tone",
+                options=["Professional", "Technical", "Executive-Friendly"],
+                index=0
+            )
 
-    with opt_col2:
-        tone_preference = st.selectbox(
-            "Proposal Tone",
-            options=["Professional", "Technical", "Executive-Friendly"],
-            index=0
+        additional_notes = st.text_area(
+            "Additional Instructions for the AI",
+            placeholder="e.g., emphasise OT/ICS experience, reference MAS TRM compliance, "
+                        "avoid mentioning competitors by name...",
+            height=100
         )
 
-    additional_notes = st.text_area(
-        "Additional Instructions for the AI",
-        placeholder="e.g., emphasise OT/ICS experience, reference MAS TRM compliance, "
-                    "avoid mentioning competitors by name...",
-        height=100
-    )
+    st.markdown("---")
 
-st.markdown("---")
+    # ── SECTION 4: Generate ──────────────────────────────────
+    st.markdown("### 🚀 Generate Proposal")
 
-# ── SECTION 4: Generate ──────────────────────────────────────
-st.markdown("### 🚀 Generate Proposal")
+    _, btn_col, _ = st.columns([1, 2, 1])
 
-_, btn_col, _ = st.columns([1, 2, 1])
+    with btn_col:
+        generate_button = st.form_submit_button(
+            "🛡️ Generate Proposal",
+            use_container_width=True,
+            type="primary"
+        )
 
-with btn_col:
-    generate_button = st.button(
-        "🛡️ Generate Proposal",
-        use_container_width=True,
-        type="primary"
-    )
+# ============================================================
+# BACKEND CLIENTS
+# ============================================================
+
+# Resolved only after the form has rendered, so first paint never waits
+# on the supabase/requests imports. Later reruns are a cache lookup.
+supabase: "Client" = init_supabase()
+http_session: "requests.Session" = init_http_session()
+webhook_pool: ThreadPoolExecutor = init_webhook_pool()
 
 # ============================================================
 # SUBMISSION HANDLER
@@ -523,14 +890,27 @@ if generate_button:
     if not is_valid:
         st.error(f"❌ {error_msg}")
 
+    # RFP bytes are read once, and only after validation has passed
+    elif is_recent_duplicate(submission_key := submission_fingerprint(
+        client_name, service_types, rfp_bytes := rfp_file.getvalue()
+    )):
+        st.warning(
+            "⚠️ This exact proposal was submitted moments ago "
+            f"(`{st.session_state.last_submission_id}`). "
+            "Track it below, or wait a minute to submit it again."
+        )
+
     else:
         submission_id = f"DACTA-{uuid.uuid4().hex[:12].upper()}"
+        submitted_at  = datetime.now(SGT)     # one clock read per submission
 
         with st.status("⚙️ Processing submission...", expanded=True) as status_box:
 
             # ── Step 1: Upload RFP to Supabase Storage ────────────
             st.write("☁️ Uploading RFP to secure storage...")
-            upload_ok, rfp_url = upload_rfp_to_supabase(rfp_file, submission_id)
+            upload_ok, rfp_url = upload_rfp_to_supabase(
+                rfp_bytes, rfp_file.name, submission_id
+            )
 
             if not upload_ok:
                 status_box.update(
@@ -542,6 +922,16 @@ if generate_button:
 
             st.write("✓ RFP uploaded to Supabase Storage")
 
+            if reference_files:
+                st.write("📎 Uploading reference materials...")
+                reference_docs, ref_errors = upload_reference_docs_to_supabase(
+                    reference_files, submission_id
+                )
+                for err in ref_errors:
+                    st.warning(f"⚠️ Reference upload note: {err}")
+            else:
+                reference_docs = []
+
             # ── Step 2: Build Payload (URL, not base64) ───────────
             payload = {
                 "client_name":   client_name.strip(),
@@ -551,10 +941,7 @@ if generate_button:
                     "url":      rfp_url,
                     "size":     rfp_file.size,
                 },
-                "reference_documents": [
-                    {"filename": f.name, "size": f.size}
-                    for f in (reference_files or [])
-                ],
+                "reference_documents": reference_docs,
                 "options": {
                     "include_pricing":  include_pricing,
                     "include_timeline": include_timeline,
@@ -563,110 +950,150 @@ if generate_button:
                 },
                 "metadata": {
                     "submission_id": submission_id,
-                    "timestamp":     datetime.now().isoformat(),
+                    "timestamp":     submitted_at.isoformat(),
                     "version":       "1.0.0"
                 }
             }
 
             # ── Step 3: Log to Supabase ───────────────────────────
             st.write("🗄️ Logging submission to database...")
-            sb_ok, sb_result = log_submission_to_supabase(payload, rfp_url)
+            sb_ok, sb_result = log_submission_with_refs(payload, rfp_url)
 
             if sb_ok:
                 st.write(f"✓ Database record created → `{sb_result}`")
-                log_reference_docs_to_supabase(sb_result, reference_files)
             else:
                 st.warning(f"⚠️ Database note: {sb_result}")
 
-            # ── Step 4: Send to Make.com ──────────────────────────
+            # ── Step 4: Trigger Make.com in the background ───────
             st.write("🔗 Triggering AI workflow via Make.com...")
-            success, message, response_data = send_to_make(payload)
+            webhook_future = webhook_pool.submit(dispatch_to_make, payload)
 
-            if success:
-                update_supabase_status(
-                    submission_id,
-                    status="draft_ready" if response_data else "processing"
-                )
-                status_box.update(
-                    label="✅ Proposal generation triggered successfully!",
-                    state="complete"
-                )
-            else:
-                update_supabase_status(submission_id, status="failed")
-                status_box.update(
-                    label="❌ Submission failed — see details below",
-                    state="error"
-                )
+            status_box.update(
+                label="✅ Proposal generation queued!",
+                state="complete"
+            )
 
         # ── Post-submission UI ────────────────────────────────────
-        if success:
-            st.success("✅ Your proposal request has been submitted!")
-            st.balloons()
-
-            st.session_state.submission_count += 1
-            st.session_state.last_submission_id = submission_id
-
-            st.info(f"""
-            **Submission Confirmed**
-
-            | Field | Value |
-            |---|---|
-            | **Submission ID** | `{submission_id}` |
-            | **Client** | {client_name} |
-            | **Services** | {', '.join(service_types)} |
-            | **RFP File** | {rfp_file.name} |
-            | **Timestamp** | {datetime.now().strftime('%d %b %Y %H:%M SGT')} |
-
-            **What happens next:**
-            1. ✅ RFP uploaded to secure storage
-            2. ✅ Payload sent to Make.com
-            3. ⏳ Gemini 2.5 Flash extracts RFP requirements
-            4. ⏳ DeepSeek performs gap analysis
-            5. ⏳ Perplexity researches market data
-            6. ⏳ Claude drafts the final proposal
-            7. 📁 All outputs saved to database
-            8. 📧 You'll be notified when ready *(~3–5 minutes)*
-            """)
+        # Counted (and celebrated) by settle_dispatches() once Make.com accepts it
+        st.success("✅ Your proposal request has been queued!")
+
+        st.session_state.last_submission_key = (submission_key, time.monotonic())
+        st.session_state.last_submission_id = submission_id
+        st.session_state.webhook_future = webhook_future
+        st.session_state.pending_dispatches = [
+            *st.session_state.pending_dispatches,
+            webhook_future
+        ]
+        st.session_state.tracked_status = None
+
+        st.info(f"""
+        **Submission Queued**
+
+        | Field | Value |
+        |---|---|
+        | **Submission ID** | `{submission_id}` |
+        | **Client** | {client_name} |
+        | **Services** | {', '.join(service_types)} |
+        | **RFP File** | {rfp_file.name} |
+        | **Timestamp** | {submitted_at.strftime('%d %b %Y %H:%M %Z')} |
+
+        **What happens next:** follow pipeline progress in the Submission
+        Tracker below (click **Refresh Status** to update). You'll be notified when ready *(~3–5 minutes)*.
+        """)
+
+# ============================================================
+# SUBMISSION TRACKER
+# ============================================================
+
+if st.session_state.last_submission_id:
+    tracked_id     = st.session_state.last_submission_id
+    webhook_future = st.session_state.webhook_future
 
+    st.markdown("---")
+    st.markdown("### 📡 Submission Tracker")
+
+    status_badges = {
+        "processing":  ("badge-processing", "⏳ Processing"),
+        "draft_ready": ("badge-ready",      "✓ Draft Ready"),
+        "failed":      ("badge-error",      "✗ Failed"),
+    }
+    # Terminal states never change again — stop querying once we see one
+    status = st.session_state.tracked_status
+    if status not in ("draft_ready", "failed"):
+        status = fetch_submission_status(tracked_id)
+        st.session_state.tracked_status = status
+    badge, label = status_badges.get(status, ("badge-info", "… Queued"))
+    st.markdown(
+        f'`{tracked_id}` <span class="status-badge {badge}">{label}</span>',
+        unsafe_allow_html=True
+    )
+
+    # Real progress — Make.com writes a proposal_events row per step
+    pipeline_steps = [
+        ("requirements",    "Gemini 2.5 Flash extracts RFP requirements"),
+        ("gap_analysis",    "DeepSeek performs gap analysis"),
+        ("market_research", "Perplexity researches market data"),
+        ("drafting",        "Claude drafts the final proposal"),
+        ("saved",           "All outputs saved to database"),
+    ]
+    if status == "draft_ready":
+        done_steps = {key for key, _ in pipeline_steps}
+    else:
+        done_steps = set(fetch_submission_events(tracked_id))
+    st.markdown("\n".join(
+        f"{i}. {'✅' if key in done_steps else '⏳'} {step}"
+        for i, (key, step) in enumerate(pipeline_steps, 1)
+    ))
+
+    webhook_ok, webhook_message, status_error = True, "", ""
+    if webhook_future is not None:
+        if webhook_future.done():
+            webhook_ok, webhook_message, status_error = webhook_future.result()
         else:
-            st.error("❌ Failed to trigger the Make.com workflow.")
-            st.error(f"**Reason:** {message}")
+            st.caption("⏳ Delivering payload to Make.com...")
+
+    # Also settles a dispatch that finished while this run was rendering
+    if settle_dispatches() or newly_accepted:
+        st.success("✅ Make.com accepted the request — your proposal is being generated.")
+        st.balloons()
+
+    if status_error:
+        st.warning(f"⚠️ {status_error}")
 
-            with st.expander("🔧 Troubleshooting Guide"):
-                st.markdown(f"""
-                **1. Webhook URL Invalid**
-                - Go to Streamlit Cloud → Settings → Secrets
-                - Verify `MAKE_WEBHOOK_URL` is correct with no trailing spaces
+    if not webhook_ok:
+        st.error("❌ Failed to trigger the Make.com workflow.")
+        st.error(f"**Reason:** {webhook_message}")
 
-                **2. Make.com Scenario Inactive**
-                - Log into Make.com
-                - Ensure your scenario is **turned ON**
-                - Check the scenario has no errors in the last execution log
+        with st.expander("🔧 Troubleshooting Guide"):
+            st.markdown(f"""
+            **1. Webhook URL Invalid**
+            - Go to Streamlit Cloud → Settings → Secrets
+            - Verify `MAKE_WEBHOOK_URL` is correct with no trailing spaces
 
-                **3. Connection Timeout**
-                - Request timed out after 60 seconds
-                - Check Make.com's status page for outages
+            **2. Make.com Scenario Inactive**
+            - Log into Make.com
+            - Ensure your scenario is **turned ON**
+            - Check the scenario has no errors in the last execution log
 
-                **4. Supabase Storage Issues**
-                - Confirm the `rfp-documents` bucket exists in Supabase Storage
-                - Verify RLS policies allow INSERT on the bucket
+            **3. Connection Timeout**
+            - Request timed out after 60 seconds
+            - Check Make.com's status page for outages
+
+            **4. Supabase Storage Issues**
+            - Confirm the `rfp-documents` bucket exists in Supabase Storage
+            - Verify RLS policies allow INSERT on the bucket
+
+            **Submission ID for admin reference:**
+            `{tracked_id}`
+            """)
 
-                **Submission ID for admin reference:**
-                `{submission_id}`
-                """)
+    st.button("🔄 Refresh Status")
 
 # ============================================================
 # FOOTER
 # ============================================================
 
 st.markdown("---")
-st.markdown("""
-    <div style='text-align:center; padding:16px; color:#6b8ca8;'>
-        <p style='font-size:12px; margin:0;'>
-            © 2025 DACTA SG · Proposal Architect v1.0.0<br>
-            Gemini · DeepSeek · Perplexity · Claude
-        </p>
-    </div>
-""", unsafe_allow_html=True)
+st.markdown(FOOTER_HTML, unsafe_allow_html=True)
 
 
@@ -0,0 +1,49 @@
+-- Insert a proposal and its reference documents in one transaction.
+-- Called from app.py via supabase.rpc("create_proposal", {"p": ..., "refs": [...]})
+-- so the submit path costs one PostgREST round-trip instead of two.
+
+create or replace function public.create_proposal(
+    p    jsonb,
+    refs jsonb default '[]'::jsonb
+)
+returns public.proposals.id%type
+language plpgsql
+as $$
+declare
+    new_id public.proposals.id%type;
+begin
+    insert into public.proposals (
+        submission_id,
+        client_name,
+        service_types,
+        status,
+        rfp_filename,
+        rfp_storage_path,
+        tone,
+        include_pricing,
+        include_timeline,
+        additional_notes
+    )
+    values (
+        p->>'submission_id',
+        p->>'client_name',
+        p->>'service_types',
+        p->>'status',
+        p->>'rfp_filename',
+        p->>'rfp_storage_path',
+        p->>'tone',
+        p->>'include_pricing',
+        p->>'include_timeline',
+        p->>'additional_notes'
+    )
+    returning id into new_id;
+
+    insert into public.reference_docs (proposal_id, filename, file_size)
+    select new_id, r->>'filename', (r->>'file_size')::bigint
+    from jsonb_array_elements(coalesce(refs, '[]'::jsonb)) as r;
+
+    return new_id;
+end;
+$$;
+
+grant execute on function public.create_proposal(jsonb, jsonb) to anon, authenticated;
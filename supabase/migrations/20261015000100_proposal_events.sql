@@ -0,0 +1,28 @@
+-- One row per completed pipeline step, written by the Make.com scenario
+-- (service role) as each AI module finishes. app.py reads these rows to
+-- show real progress in the Submission Tracker.
+--
+-- step values: requirements, gap_analysis, market_research, drafting, saved
+
+create table if not exists public.proposal_events (
+    id            bigint generated always as identity primary key,
+    submission_id text        not null,
+    step          text        not null,
+    created_at    timestamptz not null default now()
+);
+
+create index if not exists proposal_events_submission_id_idx
+    on public.proposal_events (submission_id);
+
+alter table public.proposal_events enable row level security;
+
+-- Intentionally readable by anon across all submissions: rows hold only a
+-- submission ID and a step name, no client or proposal content, and the
+-- app reads them with the anon key. Writes stay service-role only.
+drop policy if exists "anon can read proposal events" on public.proposal_events;
+
+create policy "anon can read proposal events"
+    on public.proposal_events
+    for select
+    to anon
+    using (true);
@@ -0,0 +1,65 @@
+-- Content-addressed reference documents: app.py hashes each upload
+-- (BLAKE2b, 16-byte digest) and reuses an existing Storage object
+-- instead of uploading the same file again.
+
+alter table public.reference_docs
+    add column if not exists content_hash text,
+    add column if not exists storage_path text;
+
+create index if not exists reference_docs_content_hash_idx
+    on public.reference_docs (content_hash);
+
+create or replace function public.create_proposal(
+    p    jsonb,
+    refs jsonb default '[]'::jsonb
+)
+returns public.proposals.id%type
+language plpgsql
+as $$
+declare
+    new_id public.proposals.id%type;
+begin
+    insert into public.proposals (
+        submission_id,
+        client_name,
+        service_types,
+        status,
+        rfp_filename,
+        rfp_storage_path,
+        tone,
+        include_pricing,
+        include_timeline,
+        additional_notes
+    )
+    values (
+        p->>'submission_id',
+        p->>'client_name',
+        p->>'service_types',
+        p->>'status',
+        p->>'rfp_filename',
+        p->>'rfp_storage_path',
+        p->>'tone',
+        p->>'include_pricing',
+        p->>'include_timeline',
+        p->>'additional_notes'
+    )
+    returning id into new_id;
+
+    insert into public.reference_docs (
+        proposal_id,
+        filename,
+        file_size,
+        content_hash,
+        storage_path
+    )
+    select
+        new_id,
+        r->>'filename',
+        (r->>'file_size')::bigint,
+        r->>'content_hash',
+        r->>'storage_path'
+    from jsonb_array_elements(coalesce(refs, '[]'::jsonb)) as r;
+
+    return new_id;
+end;
+$$;